@@ -10,6 +10,14 @@ with open(os.path.join("app_data", "fields.json"), 'r') as f:
 import map_detection
 app = Flask(__name__)
 
+STORE = None
+if os.environ.get("MAP_DETECTION_SHARED_STORE"):
+    STORE = map_detection.SharedGraphStore(
+        os.environ["MAP_DETECTION_SHARED_STORE"])
+CACHE = map_detection.ResultCache(store=STORE)
+if os.environ.get("MAP_DETECTION_PREWARM"):
+    map_detection.EdgelistWatcher("edgelists", CACHE).start()
+
 
 @app.route("/api/health")
 def health():
@@ -36,10 +44,10 @@ def data():
         else:
             frontends = set()
         p = os.path.join("edgelists", edgelist)
-        G = map_detection.read_edgelist(p)
-        c, v = map_detection.detectors.frontend_integration(G, frontends)
-        c -= frontends
-        for node in G.nodes:
+        weighted_edges, index, _ = CACHE.get(p)
+        c, v = index.frontend_integration(frontends)
+        c = c - frontends
+        for node in index.services:
             ac = an = av = ah = 0.0
             if node in c:
                 ac = 1.0
@@ -54,21 +62,21 @@ def data():
                           "arc__frontend_violator": av,
                           "arc__frontend_healthy": ah})
         id_ = 0
-        for edge in G.edges(data=True):
+        for edge in weighted_edges:
             edges.append({"id": id_, "source": edge[0], "target": edge[1],
-                          "mainStat": edge[2]["weight"]})
+                          "mainStat": edge[3]})
             id_ += 1
     elif detector == "ihr":
         databases = request.args.get('databases', None)
         databases = set(databases.split(',')) if databases is not None else \
                     set()
         p = os.path.join("edgelists", edgelist)
-        G = map_detection.read_edgelist(p)
+        weighted_edges, index, _ = CACHE.get(p)
         ihr_c, ihr_v, db_v, db_no_ihr = \
-            map_detection.detectors.information_holder_resource(G, databases)
+            index.information_holder_resource(databases)
         ihr_c = {t[0] for t in ihr_c}
         ihr_v = {t[0] for t in ihr_v}
-        for node in G.nodes:
+        for node in index.services:
             a_n = a_ihr_c = a_ihr_v = a_db_h = a_db_v = a_db_no_ihr = 0.0
             if node in databases:
                 if node in db_v:
@@ -94,17 +102,16 @@ def data():
                           "arc__db_no_ihr": a_db_no_ihr,
                           "arc__db_healthy": a_db_h})
         id_ = 0
-        for edge in G.edges(data=True):
+        for edge in weighted_edges:
             edges.append({"id": id_, "source": edge[0], "target": edge[1],
-                          "mainStat": edge[2]["weight"]})
+                          "mainStat": edge[3]})
             id_ += 1
     elif detector == "request_bundle":
-        endpoint_threshold = request.args.get("endpoint_threshold", 2)
-        service_threshold = request.args.get("service_threshold", 2)
+        endpoint_threshold = int(request.args.get("endpoint_threshold", 2))
+        service_threshold = int(request.args.get("service_threshold", 2))
         p = os.path.join("edgelists", edgelist)
-        bs, be = map_detection.detectors.request_bundle(p, service_threshold,
-                                                        endpoint_threshold)
-        G = map_detection.read_edgelist(p)
+        weighted_edges, index, bundle_runs = CACHE.get(p)
+        bs, be = bundle_runs.bundles(service_threshold, endpoint_threshold)
         discovered = set()
         for f, t, e, c in be:
             if f not in discovered:
@@ -115,14 +122,14 @@ def data():
                 nodes.append({"id": t, "title": t, "arc__rb_v": 1.0,
                               "arc__rc_n": 0.0})
                 discovered.add(t)
-        for node in G.nodes:
+        for node in index.services:
             if node not in discovered:
                 nodes.append({"id": node, "title": node, "arc__rb_v": 0.0,
                               "arc__rc_n": 1.0})
         id_ = 0
-        for edge in G.edges(data=True):
+        for edge in weighted_edges:
             edges.append({"id": id_, "source": edge[0], "target": edge[1],
-                          "mainStat": edge[2]["weight"]})
+                          "mainStat": edge[3]})
             id_ += 1
 
     else:
@@ -10,6 +10,14 @@ with open(os.path.join("app_data", "fields_frontend.json"), 'r') as f:
 import map_detection
 app = Flask(__name__)
 
+STORE = None
+if os.environ.get("MAP_DETECTION_SHARED_STORE"):
+    STORE = map_detection.SharedGraphStore(
+        os.environ["MAP_DETECTION_SHARED_STORE"])
+CACHE = map_detection.ResultCache(store=STORE)
+if os.environ.get("MAP_DETECTION_PREWARM"):
+    map_detection.EdgelistWatcher("edgelists", CACHE).start()
+
 
 @app.route("/api/health")
 def health():
@@ -34,10 +42,10 @@ def data():
     else:
         frontends = set()
     p = os.path.join("edgelists", edgelist)
-    G = map_detection.read_edgelist(p)
-    c, v = map_detection.detectors.frontend_integration(G, frontends)
-    c -= frontends
-    for node in G.nodes:
+    weighted_edges, index, _ = CACHE.get(p)
+    c, v = index.frontend_integration(frontends)
+    c = c - frontends
+    for node in index.services:
         ac = an = av = ah = 0.0
         if node in c:
             ac = 1.0
@@ -52,9 +60,9 @@ def data():
                       "arc__frontend_violator": av,
                       "arc__frontend_healthy": ah})
     id_ = 0
-    for edge in G.edges(data=True):
+    for edge in weighted_edges:
         edges.append({"id": id_, "source": edge[0], "target": edge[1],
-                      "mainStat": edge[2]["weight"]})
+                      "mainStat": edge[3]})
         id_ += 1
     return jsonify({"nodes": nodes, "edges": edges})
 
@@ -10,6 +10,14 @@ with open(os.path.join("app_data", "fields_ihr.json"), 'r') as f:
 import map_detection
 app = Flask(__name__)
 
+STORE = None
+if os.environ.get("MAP_DETECTION_SHARED_STORE"):
+    STORE = map_detection.SharedGraphStore(
+        os.environ["MAP_DETECTION_SHARED_STORE"])
+CACHE = map_detection.ResultCache(store=STORE)
+if os.environ.get("MAP_DETECTION_PREWARM"):
+    map_detection.EdgelistWatcher("edgelists", CACHE).start()
+
 
 @app.route("/api/health")
 def health():
@@ -32,12 +40,12 @@ def data():
     databases = set(databases.split(',')) if databases is not None else \
         set()
     p = os.path.join("edgelists", edgelist)
-    G = map_detection.read_edgelist(p)
+    weighted_edges, index, _ = CACHE.get(p)
     ihr_c, ihr_v, db_v, db_no_ihr = \
-        map_detection.detectors.information_holder_resource(G, databases)
+        index.information_holder_resource(databases)
     ihr_c = {t[0] for t in ihr_c}
     ihr_v = {t[0] for t in ihr_v}
-    for node in G.nodes:
+    for node in index.services:
         a_n = a_ihr_c = a_ihr_v = a_db_h = a_db_v = a_db_no_ihr = 0.0
         if node in databases:
             if node in db_v:
@@ -63,9 +71,9 @@ def data():
                       "arc__db_no_ihr": a_db_no_ihr,
                       "arc__db_healthy": a_db_h})
     id_ = 0
-    for edge in G.edges(data=True):
+    for edge in weighted_edges:
         edges.append({"id": id_, "source": edge[0], "target": edge[1],
-                      "mainStat": edge[2]["weight"]})
+                      "mainStat": edge[3]})
         id_ += 1
 
     return jsonify({"nodes": nodes, "edges": edges})
@@ -10,6 +10,14 @@ with open(os.path.join("app_data", "fields_rb.json"), 'r') as f:
 import map_detection
 app = Flask(__name__)
 
+STORE = None
+if os.environ.get("MAP_DETECTION_SHARED_STORE"):
+    STORE = map_detection.SharedGraphStore(
+        os.environ["MAP_DETECTION_SHARED_STORE"])
+CACHE = map_detection.ResultCache(store=STORE)
+if os.environ.get("MAP_DETECTION_PREWARM"):
+    map_detection.EdgelistWatcher("edgelists", CACHE).start()
+
 
 @app.route("/api/health")
 def health():
@@ -31,9 +39,8 @@ def data():
     endpoint_threshold = int(request.args.get("endpoint_threshold", 2))
     service_threshold = int(request.args.get("service_threshold", 2))
     p = os.path.join("edgelists", edgelist)
-    bs, be = map_detection.detectors.request_bundle(p, service_threshold,
-                                                    endpoint_threshold)
-    G = map_detection.read_edgelist(p)
+    weighted_edges, index, bundle_runs = CACHE.get(p)
+    bs, be = bundle_runs.bundles(service_threshold, endpoint_threshold)
     discovered = set()
     for f, t, e, c in be:
         if f not in discovered:
@@ -44,14 +51,14 @@ def data():
             nodes.append({"id": t, "title": t, "arc__rb_v": 1.0,
                           "arc__rb_n": 0.0})
             discovered.add(t)
-    for node in G.nodes:
+    for node in index.services:
         if node not in discovered:
             nodes.append({"id": node, "title": node, "arc__rb_v": 0.0,
                           "arc__rb_n": 1.0})
     id_ = 0
-    for edge in G.edges(data=True):
+    for edge in weighted_edges:
         edges.append({"id": id_, "source": edge[0], "target": edge[1],
-                      "mainStat": edge[2]["weight"]})
+                      "mainStat": edge[3]})
         id_ += 1
 
     return jsonify({"nodes": nodes, "edges": edges})
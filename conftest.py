@@ -0,0 +1,2 @@
+# Makes pytest put the repository root on sys.path, so that the tests can
+# import map_detection without installing it.
@@ -1,2 +1,7 @@
-from .read_edgelist import read_edgelist
+from .read_edgelist import read_edgelist, record_edgelist
+from .sketch import read_edgelist_sketch
+from .degree_index import DegreeIndex, evaluate_designations
+from .merge import merge_edgelists
+from .prewarm import ResultCache, EdgelistWatcher
+from .shared_store import SharedGraphStore
 import map_detection.detectors
\ No newline at end of file
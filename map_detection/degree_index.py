@@ -0,0 +1,234 @@
+from collections.abc import Set
+from itertools import chain
+
+import networkx as nx
+import numpy as np
+
+__all__ = ['DegreeIndex', 'evaluate_designations']
+
+
+def _degree_arrays(n, u, v):
+    """Degree arrays of n services from the distinct edges u[i] -> v[i]."""
+    in_degree = np.bincount(v, minlength=n)
+    out_degree = np.bincount(u, minlength=n)
+    single_pred = np.full(n, -1, dtype=np.int64)
+    single = in_degree[v] == 1
+    single_pred[v[single]] = u[single]
+    pred_out_degree = np.where(single_pred >= 0,
+                               out_degree[np.maximum(single_pred, 0)], -1)
+    return in_degree, out_degree, single_pred, pred_out_degree
+
+
+class _ExtendedSet(Set):
+    """Read-only union of a precomputed frozenset and disjoint additions.
+
+    Lets a check return the designation-independent results plus its own
+    additions without copying the former. Set operations return sets.
+    """
+
+    def __init__(self, base, extra):
+        self._base = base
+        self._extra = extra
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return set(iterable)
+
+    def __contains__(self, item):
+        return item in self._base or item in self._extra
+
+    def __iter__(self):
+        return chain(self._base, self._extra)
+
+    def __len__(self):
+        return len(self._base) + len(self._extra)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({set(self)!r})"
+
+
+class DegreeIndex:
+    """Degree index of a call graph for repeated designation checks.
+
+    The graph is converted to a simple DiGraph once and, per service, its
+    in/out degree, single predecessor (-1 if none) and the out-degree of
+    that predecessor are stored in numpy arrays indexed like services. The
+    designation-independent results (frontend candidates, IHR pairs of
+    services without outgoing calls) are computed once as well, so checking
+    a set of frontend or database services only costs O(|set|). Results are
+    the same as those of frontend_integration and
+    information_holder_resource, without the logs, except that candidate
+    sets are read-only (frozensets or views over them): use set operations
+    such as c - frontends rather than updating them in place.
+
+    Parameters
+    __________
+    G : networkx.MultiDiGraph,
+        Graph to be indexed (converted to simple DiGraph)
+    """
+
+    def __init__(self, G):
+        D = nx.DiGraph(G)
+        services = list(D.nodes)
+        ids = {service: i for i, service in enumerate(services)}
+        u = np.array([ids[f] for f, t in D.edges], dtype=np.int64)
+        v = np.array([ids[t] for f, t in D.edges], dtype=np.int64)
+        self._init(services, *_degree_arrays(len(services), u, v))
+
+    @classmethod
+    def from_edges(cls, services, caller, callee):
+        """Build the index from integer-coded calls caller[i] -> callee[i].
+
+        Parameters
+        __________
+        services : list[str],
+            Service names, indexed by the ids in caller and callee
+        caller, callee : numpy.ndarray[int],
+            Ids of the calling and called service of every call
+        """
+        n = len(services)
+        pairs = np.unique(np.asarray(caller, dtype=np.int64) * n +
+                          np.asarray(callee, dtype=np.int64))
+        index = cls.__new__(cls)
+        index._init(services, *_degree_arrays(n, pairs // n, pairs % n))
+        return index
+
+    @classmethod
+    def from_arrays(cls, services, in_degree, out_degree, single_pred,
+                    pred_out_degree):
+        """Wrap existing degree arrays (e.g. in shared memory) without copy."""
+        index = cls.__new__(cls)
+        index._init(services, in_degree, out_degree, single_pred,
+                    pred_out_degree)
+        return index
+
+    def _init(self, services, in_degree, out_degree, single_pred,
+              pred_out_degree):
+        self.services = services
+        self._ids = {service: i for i, service in enumerate(services)}
+        self.in_degree = in_degree
+        self.out_degree = out_degree
+        self.single_pred = single_pred
+        self.pred_out_degree = pred_out_degree
+
+        self.frontend_candidates = frozenset(
+            services[i] for i in
+            np.flatnonzero((in_degree == 0) & (out_degree > 0)).tolist())
+        ihr_candidates = set()
+        ihr_violators = set()
+        for i in np.flatnonzero((single_pred >= 0) &
+                                (out_degree == 0)).tolist():
+            pair = services[single_pred[i]], services[i]
+            if pred_out_degree[i] == 1:
+                ihr_candidates.add(pair)
+            else:
+                ihr_violators.add(pair)
+        self.ihr_candidates = frozenset(ihr_candidates)
+        self.ihr_violators = frozenset(ihr_violators)
+
+    def frontend_integration(self, frontend_services=None):
+        """Check a frontend designation, see frontend_integration.
+
+        Returns
+        _______
+        frontend_candidates : frozenset[str],
+            Services that have only outgoing calls.
+        frontend_violators : set[str],
+            Services from frontend_services that violate the pattern
+            (receive calls)
+        """
+
+        if frontend_services is None: frontend_services = set()
+
+        frontend_violators = {node for node in frontend_services
+                              if node in self._ids and
+                              self.in_degree[self._ids[node]] > 0}
+
+        return self.frontend_candidates, frontend_violators
+
+    def information_holder_resource(self, database_services=None):
+        """Check a database designation, see information_holder_resource.
+
+        Returns
+        _______
+        ihr_candidates : collections.abc.Set[tuple[str, str]],
+            Services that could be IHR for some DB (pairs (IHR, DB))
+        ihr_violators : collections.abc.Set[tuple[str, str]],
+            Services that could be IHR for some DB, but they also call other
+            services (pairs (IHR, DB))
+        database_call_violators : set[str],
+            Services from database_services that call other services
+        database_no_ihr_violators : set[str],
+            Services from database_services that have no apparent IHR
+        """
+
+        if database_services is None: database_services = set()
+
+        # Only databases that call other services add pairs, those are not
+        # in the precomputed sets (built from services without calls)
+        ihr_candidates = set()
+        ihr_violators = set()
+        database_call_violators = set()
+        database_no_ihr_violators = set()
+
+        for node in database_services:
+            i = self._ids.get(node)
+            if i is None:
+                database_no_ihr_violators.add(node)
+                continue
+            pred = self.single_pred[i]
+            has_ihr = pred >= 0 and self.pred_out_degree[i] == 1
+            if pred >= 0 and self.out_degree[i] > 0:
+                pair = self.services[pred], node
+                if has_ihr:
+                    ihr_candidates.add(pair)
+                else:
+                    ihr_violators.add(pair)
+            if not has_ihr:
+                database_no_ihr_violators.add(node)
+            if self.out_degree[i] > 0:
+                database_call_violators.add(node)
+
+        return _ExtendedSet(self.ihr_candidates, ihr_candidates), \
+            _ExtendedSet(self.ihr_violators, ihr_violators), \
+            database_call_violators, database_no_ihr_violators
+
+    def evaluate(self, hypotheses):
+        """Check many designations against the indexed graph.
+
+        Parameters
+        __________
+        hypotheses : iterable[tuple[set[str], set[str]]],
+            Pairs (frontend_services, database_services), either may be None
+
+        Returns
+        _______
+        results : list[tuple[tuple, tuple]],
+            For every hypothesis, the results of frontend_integration and
+            information_holder_resource
+        """
+
+        return [(self.frontend_integration(frontends),
+                 self.information_holder_resource(databases))
+                for frontends, databases in hypotheses]
+
+
+def evaluate_designations(G, hypotheses):
+    """Check many frontend/database designations against one graph.
+
+    Parameters
+    __________
+    G : networkx.MultiDiGraph or DegreeIndex,
+        Graph to be studied, indexed once if not already a DegreeIndex
+    hypotheses : iterable[tuple[set[str], set[str]]],
+        Pairs (frontend_services, database_services), either may be None
+
+    Returns
+    _______
+    results : list[tuple[tuple, tuple]],
+        For every hypothesis, the results of frontend_integration and
+        information_holder_resource
+    """
+
+    index = G if isinstance(G, DegreeIndex) else DegreeIndex(G)
+    return index.evaluate(hypotheses)
@@ -1,7 +1,10 @@
 from .frontend_integration import frontend_integration
-from .request_bundle import request_bundle
+from .request_bundle import request_bundle, request_bundle_sketch
 from .information_holder_resource import information_holder_resource
+from .bundle_runs import BundleRuns
 
 __all__ = ['request_bundle',
+           'request_bundle_sketch',
            'frontend_integration',
-           'information_holder_resource']
+           'information_holder_resource',
+           'BundleRuns']
@@ -0,0 +1,206 @@
+from collections import Counter
+
+import numpy as np
+
+from map_detection.read_edgelist import edge_lines
+
+__all__ = ['BundleRuns']
+
+
+class _Runs:
+    """Run-length table of one detection level, with a length-sorted index.
+
+    Arrays of the right dtype (e.g. in shared memory) are used without copy.
+    """
+
+    COLUMNS = ('start', 'length', 'caller', 'callee', 'endpoint',
+               'by_length', 'sorted_length')
+
+    def __init__(self, start, length, caller, callee, endpoint=None,
+                 by_length=None, sorted_length=None):
+        self.start = np.asarray(start, dtype=np.int64)
+        self.length = np.asarray(length, dtype=np.int64)
+        self.caller = np.asarray(caller, dtype=np.int32)
+        self.callee = np.asarray(callee, dtype=np.int32)
+        self.endpoint = None if endpoint is None else \
+            np.asarray(endpoint, dtype=np.int32)
+        if by_length is None:
+            by_length = np.argsort(self.length, kind='stable')
+        self.by_length = np.asarray(by_length, dtype=np.int64)
+        if sorted_length is None:
+            sorted_length = self.length[self.by_length]
+        self.sorted_length = np.asarray(sorted_length, dtype=np.int64)
+
+    @classmethod
+    def from_calls(cls, caller, callee, endpoint=None):
+        """Split integer-coded calls into runs of identical calls."""
+        keys = [caller, callee] if endpoint is None else \
+            [caller, callee, endpoint]
+        n = len(caller)
+        change = np.ones(n, dtype=bool)
+        for key in keys:
+            change[1:] &= key[1:] == key[:-1]
+        change[1:] = ~change[1:]
+        start = np.flatnonzero(change)
+        length = np.diff(np.append(start, n))
+        return cls(start, length, *(key[start] for key in keys))
+
+    def columns(self):
+        """Return the arrays of the table by name, see COLUMNS."""
+        return {name: getattr(self, name) for name in self.COLUMNS
+                if getattr(self, name) is not None}
+
+    def at_least(self, threshold):
+        """Indices of closed runs of length >= threshold, in file order."""
+        i = np.searchsorted(self.sorted_length, threshold, side='left')
+        selected = np.sort(self.by_length[i:])
+        # The last run is never followed by another call, request_bundle
+        # does not report it
+        return selected[selected < len(self.length) - 1]
+
+
+class BundleRuns:
+    """Threshold-independent request bundle detection.
+
+    The edgelist is read once and every run of consecutive calls between
+    the same services (service level) and to the same endpoint (endpoint
+    level) is recorded as a run-length table of run start, length and
+    caller/callee/endpoint ids. Bundles for any thresholds are then found
+    by binary search on a length-sorted index, giving the same results as
+    request_bundle without reading the edgelist again.
+
+    Parameters
+    __________
+    edgelist : str or iterable[str],
+        Filename of the edgelist of the call graph with edges sorted by time,
+        or its lines (e.g. from merge_edgelists)
+    """
+
+    def __init__(self, edgelist):
+        service_ids = dict()
+        endpoint_ids = dict()
+        caller, callee, endpoint = [], [], []
+        with edge_lines(edgelist) as edges:
+            for edge in edges:
+                from_service, to_service, endpoint_, time = edge.split(' ')
+                caller.append(service_ids.setdefault(from_service,
+                                                     len(service_ids)))
+                callee.append(service_ids.setdefault(to_service,
+                                                     len(service_ids)))
+                endpoint.append(endpoint_ids.setdefault(endpoint_,
+                                                        len(endpoint_ids)))
+        self._init_calls(list(service_ids), list(endpoint_ids),
+                         np.array(caller, dtype=np.int32),
+                         np.array(callee, dtype=np.int32),
+                         np.array(endpoint, dtype=np.int32))
+
+    @classmethod
+    def from_calls(cls, services, endpoints, caller, callee, endpoint):
+        """Build the run tables from integer-coded calls in time order.
+
+        Parameters
+        __________
+        services : list[str],
+            Service names, indexed by the ids in caller and callee
+        endpoints : list[str],
+            Endpoint names, indexed by the ids in endpoint
+        caller, callee, endpoint : numpy.ndarray[int],
+            Ids of the calling service, called service and endpoint of
+            every call
+        """
+        runs = cls.__new__(cls)
+        runs._init_calls(services, endpoints, caller, callee, endpoint)
+        return runs
+
+    @classmethod
+    def from_columns(cls, services, endpoints, service_columns,
+                     endpoint_columns):
+        """Wrap existing run tables (e.g. in shared memory) without copy.
+
+        service_columns and endpoint_columns map the names in _Runs.COLUMNS
+        to arrays, as returned by columns() of service_runs and
+        endpoint_runs.
+        """
+        runs = cls.__new__(cls)
+        runs.services = services
+        runs.endpoints = endpoints
+        runs.service_runs = _Runs(**service_columns)
+        runs.endpoint_runs = _Runs(**endpoint_columns)
+        return runs
+
+    def _init_calls(self, services, endpoints, caller, callee, endpoint):
+        self.services = services
+        self.endpoints = endpoints
+        self.service_runs = _Runs.from_calls(caller, callee)
+        self.endpoint_runs = _Runs.from_calls(caller, callee, endpoint)
+
+    def bundles(self, threshold_service=2, threshold_endpoint=2):
+        """Detect request bundles, see request_bundle.
+
+        Parameters
+        __________
+        threshold_service : int, optional (default 2)
+            Minimum count of consecutive calls necessary to make up a bundle
+            in service-level detection
+        threshold_endpoint : int, optional (default 2)
+            Minimum count of consecutive calls necessary to make up a bundle
+            in endpoint-level detection
+
+        Returns
+        _______
+        bundles_service : list[tuple[str, str, int]],
+            Detected bundles in service-level detection
+        bundles_endpoint : list[tuple[str, str, str, int]],
+            Detected bundles in endpoint-level detection
+        """
+
+        runs = self.service_runs
+        bundles_service = [(self.services[runs.caller[i]],
+                            self.services[runs.callee[i]],
+                            int(runs.length[i]))
+                           for i in runs.at_least(threshold_service)]
+        runs = self.endpoint_runs
+        bundles_endpoint = [(self.services[runs.caller[i]],
+                             self.services[runs.callee[i]],
+                             self.endpoints[runs.endpoint[i]],
+                             int(runs.length[i]))
+                            for i in runs.at_least(threshold_endpoint)]
+
+        return bundles_service, bundles_endpoint
+
+    def histograms(self, endpoint_level=False):
+        """Run-length histograms per service pair (or endpoint).
+
+        All runs are counted, including runs of length 1 and the last run
+        of the edgelist.
+
+        Parameters
+        __________
+        endpoint_level : bool, optional (default False)
+            Histograms per (from_service, to_service, endpoint) instead of
+            per (from_service, to_service)
+
+        Returns
+        _______
+        histograms : dict[tuple, collections.Counter],
+            Number of runs of each length, per service pair (or endpoint)
+        """
+
+        if endpoint_level:
+            runs = self.endpoint_runs
+            columns = runs.caller, runs.callee, runs.endpoint, runs.length
+        else:
+            runs = self.service_runs
+            columns = runs.caller, runs.callee, runs.length
+        histograms = dict()
+        if len(runs.length) == 0:
+            return histograms
+        rows, counts = np.unique(np.stack(columns, axis=1), axis=0,
+                                 return_counts=True)
+        for row, count in zip(rows, counts):
+            key = (self.services[row[0]], self.services[row[1]])
+            if endpoint_level:
+                key = (*key, self.endpoints[row[2]])
+            histograms.setdefault(key, Counter())[int(row[-1])] = int(count)
+
+        return histograms
@@ -1,4 +1,7 @@
 import argparse
+import heapq
+
+from map_detection.read_edgelist import edge_lines
 
 
 def request_bundle(edgelist, threshold_service=2,
@@ -11,8 +14,9 @@ def request_bundle(edgelist, threshold_service=2,
     bundle is a tuple of the form (from_service, to_service, count) for service-level detection
     and (from_service, to_service, endpoint, count) for endpoint-level detection.
 
-    edgelist : str,
-        Filename of the edgelist of the call graph with edges sorted by time
+    edgelist : str or iterable[str],
+        Filename of the edgelist of the call graph with edges sorted by time,
+        or its lines (e.g. from merge_edgelists)
     threshold_service : int, optional (default 2)
         Minimum count of consecutive calls necessary to make up a bundle in
         service-level detection (default = 2, i.e. any repeated call
@@ -32,39 +36,124 @@ def request_bundle(edgelist, threshold_service=2,
         Detected bundles in endpoint-level detection
     """
 
-    with open(edgelist, 'r') as f:
-        edges = f.readlines()
     bundles_service = []
     bundles_endpoint = []
     last_call_service = None
     last_call_endpoint = None
     count_service = 1
     count_endpoint = 1
-    for edge in edges:
-        from_service, to_service, endpoint, time = edge.split(' ')
-        current_call_service = from_service, to_service
-        current_call_endpoint = from_service, to_service, endpoint
-        if current_call_service == last_call_service:
-            count_service += 1
-        else:
-            if count_service >= threshold_service:
-                bundles_service.append((*last_call_service, count_service))
-                print(f"{user}: Service-level request bundle detected between "
-                      f"{last_call_service[0]} and {last_call_service[1]} "
-                      f"with count {count_service}")
-            count_service = 1
-            last_call_service = current_call_service
-
-        if current_call_endpoint == last_call_endpoint:
-            count_endpoint += 1
-        else:
-            if count_endpoint >= threshold_endpoint:
-                bundles_endpoint.append((*last_call_endpoint, count_endpoint))
-                print(f"{user}: Endpoint-level request bundle detected between "
-                      f"{last_call_endpoint[0]} and {last_call_endpoint[1]}"
-                      f"{last_call_endpoint[2]} with count {count_endpoint}")
-            count_endpoint = 1
-            last_call_endpoint = current_call_endpoint
+    with edge_lines(edgelist) as edges:
+        for edge in edges:
+            from_service, to_service, endpoint, time = edge.split(' ')
+            current_call_service = from_service, to_service
+            current_call_endpoint = from_service, to_service, endpoint
+            if current_call_service == last_call_service:
+                count_service += 1
+            else:
+                if count_service >= threshold_service:
+                    bundles_service.append((*last_call_service,
+                                            count_service))
+                    print(f"{user}: Service-level request bundle detected "
+                          f"between {last_call_service[0]} and "
+                          f"{last_call_service[1]} with count {count_service}")
+                count_service = 1
+                last_call_service = current_call_service
+
+            if current_call_endpoint == last_call_endpoint:
+                count_endpoint += 1
+            else:
+                if count_endpoint >= threshold_endpoint:
+                    bundles_endpoint.append((*last_call_endpoint,
+                                             count_endpoint))
+                    print(f"{user}: Endpoint-level request bundle detected "
+                          f"between {last_call_endpoint[0]} and "
+                          f"{last_call_endpoint[1]}{last_call_endpoint[2]} "
+                          f"with count {count_endpoint}")
+                count_endpoint = 1
+                last_call_endpoint = current_call_endpoint
+
+    return bundles_service, bundles_endpoint
+
+
+def request_bundle_sketch(edgelist, threshold_service=2,
+                          threshold_endpoint=2, k=100, user='NoUser'):
+    """Detect the k largest request bundles in fixed memory.
+
+    Same detection as request_bundle, but only the k bundles with the
+    highest count are kept on each level, so memory does not grow with the
+    length of the edgelist. Counts of the returned bundles are exact; a
+    bundle is missing from the result only if k larger ones were found.
+
+    edgelist : str or iterable[str],
+        Filename of the edgelist of the call graph with edges sorted by time,
+        or its lines (e.g. from merge_edgelists)
+    threshold_service : int, optional (default 2)
+        Minimum count of consecutive calls necessary to make up a bundle in
+        service-level detection
+    threshold_endpoint : int, optional (default 2)
+        Minimum count of consecutive calls necessary to make up a bundle in
+        endpoint-level detection
+    k : int, optional (default 100)
+        Number of largest bundles kept on each level
+    user : str, optional (default 'NoUser')
+        User's name to put in logs
+
+    Returns
+    _______
+    bundles_service : list[tuple[str, str, int]],
+        Largest bundles in service-level detection, by descending count
+    bundles_endpoint : list[tuple[str, str, str, int]],
+        Largest bundles in endpoint-level detection, by descending count
+    """
+
+    # Min-heaps of (count, sequence number, bundle)
+    heap_service = []
+    heap_endpoint = []
+    last_call_service = None
+    last_call_endpoint = None
+    count_service = 1
+    count_endpoint = 1
+    with edge_lines(edgelist) as edges:
+        for i, edge in enumerate(edges):
+            from_service, to_service, endpoint, time = edge.split(' ')
+            current_call_service = from_service, to_service
+            current_call_endpoint = from_service, to_service, endpoint
+            if current_call_service == last_call_service:
+                count_service += 1
+            else:
+                if last_call_service is not None and \
+                        count_service >= threshold_service:
+                    item = (count_service, i,
+                            (*last_call_service, count_service))
+                    if len(heap_service) < k:
+                        heapq.heappush(heap_service, item)
+                    else:
+                        heapq.heappushpop(heap_service, item)
+                count_service = 1
+                last_call_service = current_call_service
+
+            if current_call_endpoint == last_call_endpoint:
+                count_endpoint += 1
+            else:
+                if last_call_endpoint is not None and \
+                        count_endpoint >= threshold_endpoint:
+                    item = (count_endpoint, i,
+                            (*last_call_endpoint, count_endpoint))
+                    if len(heap_endpoint) < k:
+                        heapq.heappush(heap_endpoint, item)
+                    else:
+                        heapq.heappushpop(heap_endpoint, item)
+                count_endpoint = 1
+                last_call_endpoint = current_call_endpoint
+
+    bundles_service = [b for _, _, b in sorted(heap_service, reverse=True)]
+    bundles_endpoint = [b for _, _, b in sorted(heap_endpoint, reverse=True)]
+    for f, t, c in bundles_service:
+        print(f"{user}: Service-level request bundle detected between "
+              f"{f} and {t} with count {c}")
+    for f, t, e, c in bundles_endpoint:
+        print(f"{user}: Endpoint-level request bundle detected between "
+              f"{f} and {t}{e} with count {c}")
 
     return bundles_service, bundles_endpoint
 
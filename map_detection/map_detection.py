@@ -4,13 +4,16 @@ from map_detection.detectors import *
 
 __all__ = []
 
-from map_detection.read_edgelist import read_edgelist
+import networkx as nx
+
+from map_detection.read_edgelist import read_edgelist, record_edgelist
+from map_detection.merge import merge_edgelists
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('--edgelist', '-e', required=True, help="Path to the "
-                                                                "graph "
-                                                                "edgelist")
+    parser.add_argument('--edgelist', '-e', required=True, nargs='+',
+                        help="Path to the graph edgelist, several time-sorted "
+                             "edgelists are merged by time")
     parser.add_argument('--user', '-u', required=False, default='NoUser',
                         help="Name of the User for the logs")
     parser.add_argument('--frontends', '-f', nargs='+', help='List of the '
@@ -32,10 +35,22 @@ if __name__ == '__main__':
                                                         "bundle on service "
                                                         "level detection")
     args = parser.parse_args()
-    G = read_edgelist(args.edgelist)
     databases = None if args.databases is None else set(args.databases)
     frontends = None if args.frontends is None else set(args.frontends)
-    frontend_integration(G, frontend_services=frontends, user=args.user)
-    information_holder_resource(G, database_services=databases, user=args.user)
-    request_bundle(args.edgelist, args.service_threshold,
-                   args.endpoint_threshold, args.user)
+    if len(args.edgelist) == 1:
+        G = read_edgelist(args.edgelist[0])
+        frontend_integration(G, frontend_services=frontends, user=args.user)
+        information_holder_resource(G, database_services=databases,
+                                    user=args.user)
+        request_bundle(args.edgelist[0], args.service_threshold,
+                       args.endpoint_threshold, args.user)
+    else:
+        # Merge once: the graph is built while request_bundle consumes the
+        # merged stream, the graph detectors run afterwards
+        G = nx.MultiDiGraph()
+        request_bundle(record_edgelist(merge_edgelists(args.edgelist), G),
+                       args.service_threshold, args.endpoint_threshold,
+                       args.user)
+        frontend_integration(G, frontend_services=frontends, user=args.user)
+        information_holder_resource(G, database_services=databases,
+                                    user=args.user)
@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import heapq
+import os
+import tempfile
+from datetime import datetime
+
+__all__ = ['merge_edgelists']
+
+
+def _time(edge):
+    return datetime.fromisoformat(edge.rsplit(' ', 1)[1].rstrip('\n'))
+
+
+def _is_time_sorted(path):
+    last = None
+    with open(path, 'r') as f:
+        for edge in f:
+            if not edge.strip():
+                continue
+            time = _time(edge)
+            if last is not None and time < last:
+                return False
+            last = time
+    return True
+
+
+def _edges(f):
+    for edge in f:
+        if not edge.strip():
+            continue
+        yield edge if edge.endswith('\n') else edge + '\n'
+
+
+def _spill(edges, tmp_dir, spills):
+    """Write edges to a new spill file and return its path."""
+    fd, path = tempfile.mkstemp(suffix='.edgelist', dir=tmp_dir)
+    spills.add(path)
+    with os.fdopen(fd, 'w') as f:
+        f.writelines(edges)
+    return path
+
+
+def _spill_sorted_runs(path, chunk_size, tmp_dir, spills):
+    """External sort: write path as sorted runs of chunk_size edges each."""
+    runs = []
+    with open(path, 'r') as f:
+        chunk = []
+        for edge in _edges(f):
+            chunk.append(edge)
+            if len(chunk) == chunk_size:
+                chunk.sort(key=_time)
+                runs.append(_spill(chunk, tmp_dir, spills))
+                chunk = []
+        if chunk:
+            chunk.sort(key=_time)
+            runs.append(_spill(chunk, tmp_dir, spills))
+    return runs
+
+
+def _merge_runs(runs):
+    """Heap-merge the time-sorted files runs, holding one open file each."""
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(open(run, 'r')) for run in runs]
+        yield from heapq.merge(*(_edges(f) for f in files), key=_time)
+
+
+def merge_edgelists(paths, chunk_size=100000, fan_in=64, tmp_dir=None):
+    """Merge several edgelists into one stream of edges sorted by time.
+
+    Time-sorted edgelists (e.g. one per pod or collector) are k-way merged
+    with a heap, holding one edge per input in memory. An edgelist that is
+    not sorted by time is external-sorted first: it is split into sorted
+    runs of chunk_size edges spilled to temporary files, which join the
+    merge. At most fan_in files are read at once: while there are more
+    runs, consecutive groups of fan_in runs are merged into larger spilled
+    runs. Edges with equal times keep the order of paths. Nothing is
+    written apart from the spill files, the result can be passed straight
+    to read_edgelist or request_bundle.
+
+    Parameters
+    __________
+    paths : iterable[str],
+        Filenames of the edgelists to merge
+    chunk_size : int, optional (default 100000)
+        Number of edges held in memory when sorting an unsorted edgelist
+    fan_in : int, optional (default 64)
+        Maximum number of files merged (and read) at once, at least 2
+    tmp_dir : str, optional (default None)
+        Directory for the spill files, system default if None
+
+    Yields
+    ______
+    edge : str,
+        Edgelist lines ordered by time
+    """
+
+    if fan_in < 2:
+        raise ValueError(f"fan_in must be at least 2, got {fan_in}")
+    spills = set()
+    try:
+        runs = []
+        for path in paths:
+            if _is_time_sorted(path):
+                runs.append(path)
+            else:
+                runs.extend(_spill_sorted_runs(path, chunk_size, tmp_dir,
+                                               spills))
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                group = runs[i:i + fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                merged.append(_spill(_merge_runs(group), tmp_dir, spills))
+                for run in group:
+                    if run in spills:
+                        spills.discard(run)
+                        os.remove(run)
+            runs = merged
+        yield from _merge_runs(runs)
+    finally:
+        for run in spills:
+            os.remove(run)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--edgelists', '-e', required=True, nargs='+',
+                        help="Paths to the graph edgelists")
+    parser.add_argument('--chunk_size', '-c', type=int, required=False,
+                        default=100000, help="Number of edges sorted in "
+                                             "memory for unsorted edgelists")
+    parser.add_argument('--fan_in', type=int, required=False, default=64,
+                        help="Maximum number of files merged at once")
+    args = parser.parse_args()
+    for edge in merge_edgelists(args.edgelists, args.chunk_size,
+                                args.fan_in):
+        print(edge, end='')
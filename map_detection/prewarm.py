@@ -0,0 +1,273 @@
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import networkx as nx
+
+from map_detection.read_edgelist import record_edgelist
+from map_detection.degree_index import DegreeIndex
+from map_detection.detectors.bundle_runs import BundleRuns
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+__all__ = ['Results', 'ResultCache', 'EdgelistWatcher', 'compute_results']
+
+Results = namedtuple('Results', ['edges', 'index', 'bundle_runs'])
+Results.__doc__ = """Weighted edges and detector outputs of one edgelist.
+
+edges : list[tuple[str, str, str, int]],
+    (from, to, endpoint, weight) edges of the graph read from the edgelist,
+    as G.edges(keys=True, data='weight')
+index : DegreeIndex,
+    Degree index answering frontend and database designation checks, its
+    services are the nodes of the graph
+bundle_runs : BundleRuns,
+    Run-length table answering request bundle detection for any thresholds
+"""
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def compute_results(path, store=None):
+    """Parse an edgelist and run all detectors on it.
+
+    If store (a SharedGraphStore) is given and path is published in it, the
+    results wrap the tables the loader published instead, without reading
+    the file or building the graph.
+    """
+    if store is not None:
+        try:
+            shared = store.attach(path)
+        except KeyError:
+            pass
+        else:
+            with shared:
+                return Results(shared.weighted_edges(),
+                               shared.degree_index(), shared.bundle_runs())
+    # A single pass over the file feeds both the graph and the run tables
+    G = nx.MultiDiGraph()
+    bundle_runs = BundleRuns(record_edgelist(path, G))
+    return Results(list(G.edges(keys=True, data='weight')), DegreeIndex(G),
+                   bundle_runs)
+
+
+class ResultCache:
+    """Thread-safe LRU cache of Results per edgelist.
+
+    Entries are invalidated when the modification time or size of the
+    edgelist changes, or when a new version is published in the store.
+
+    Parameters
+    __________
+    maxsize : int, optional (default 64)
+        Maximum number of edgelists kept
+    store : SharedGraphStore, optional (default None)
+        If given, edgelists published in it are read from shared memory
+    """
+
+    def __init__(self, maxsize=64, store=None):
+        self.maxsize = maxsize
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _signature(self, path):
+        if self.store is not None:
+            signature = self.store.signature(path)
+            if signature is not None:
+                return signature
+        return _signature(path)
+
+    def is_warm(self, path, signature=None):
+        if signature is None:
+            signature = self._signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        return entry is not None and entry[0] == signature
+
+    def get(self, path):
+        """Return the Results of path, computing them if not warm."""
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                return entry[1]
+        results = compute_results(path, self.store)
+        self._put(path, signature, results)
+        return results
+
+    def warm(self, path):
+        """Compute the Results of path unless they are already warm."""
+        signature = self._signature(path)
+        if not self.is_warm(path, signature):
+            self._put(path, signature, compute_results(path, self.store))
+
+    def remove(self, path):
+        """Drop the Results of path, raising KeyError if not cached."""
+        with self._lock:
+            del self._entries[path]
+
+    def _put(self, path, signature, results):
+        with self._lock:
+            self._entries[path] = signature, results
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class EdgelistWatcher(threading.Thread):
+    """Background worker pre-warming a ResultCache for new edgelists.
+
+    The directory is polled every interval seconds, or woken up early by
+    inotify events when inotify_simple is installed. A new or changed file
+    is queued once its size and modification time have been stable for
+    debounce seconds, so files still being written are skipped. Queued
+    files are processed one at a time by a worker thread running at the
+    lowest scheduling priority. When the bounded queue is full, files are
+    retried on the next scan. Files deleted from the directory are removed
+    from the cache.
+
+    The priority only matters against other processes: within the process
+    the worker still competes for the GIL with request threads, which wait
+    while it parses a file. To keep parsing out of request latency, run the
+    watcher in a separate loader process publishing to a SharedGraphStore
+    (python -m map_detection.shared_store) instead.
+
+    Parameters
+    __________
+    directory : str,
+        Directory of the edgelists
+    cache : ResultCache,
+        Cache to be warmed
+    interval : float, optional (default 1.0)
+        Seconds between directory scans
+    debounce : float, optional (default 2.0)
+        Seconds a file must stay unchanged before it is processed
+    queue_size : int, optional (default 16)
+        Maximum number of files waiting to be processed
+    suffix : str, optional (default '.edgelist')
+        Only files with this suffix are watched
+    warm_existing : bool, optional (default False)
+        Also warm the files already present when the watcher starts
+    """
+
+    def __init__(self, directory, cache, interval=1.0, debounce=2.0,
+                 queue_size=16, suffix='.edgelist', warm_existing=False):
+        super().__init__(name='EdgelistWatcher', daemon=True)
+        self.directory = directory
+        self.cache = cache
+        self.interval = interval
+        self.debounce = debounce
+        self.suffix = suffix
+        self.warm_existing = warm_existing
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        # path -> [signature, time first seen with it, queued]
+        self._seen = dict()
+        self._first_scan = True
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        worker = threading.Thread(target=self._work, name='EdgelistWarmer',
+                                  daemon=True)
+        worker.start()
+        notify = self._open_inotify()
+        try:
+            while not self._stop_event.is_set():
+                self._scan()
+                if notify is not None:
+                    notify.read(timeout=int(self.interval * 1000))
+                else:
+                    self._stop_event.wait(self.interval)
+        finally:
+            if notify is not None:
+                notify.close()
+
+    def _open_inotify(self):
+        if inotify_simple is None:
+            return None
+        flags = inotify_simple.flags
+        notify = inotify_simple.INotify()
+        try:
+            notify.add_watch(self.directory, flags.CREATE | flags.MODIFY |
+                             flags.CLOSE_WRITE | flags.MOVED_TO)
+        except OSError:
+            notify.close()
+            return None
+        return notify
+
+    def _scan(self):
+        now = time.monotonic()
+        present = set()
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.name.endswith(self.suffix) or not entry.is_file():
+                continue
+            path = os.path.join(self.directory, entry.name)
+            present.add(path)
+            try:
+                signature = _signature(path)
+            except OSError:
+                continue
+            seen = self._seen.get(path)
+            if self._first_scan and not self.warm_existing:
+                self._seen[path] = [signature, now, True]
+                continue
+            if seen is None or seen[0] != signature:
+                self._seen[path] = [signature, now, False]
+                continue
+            if seen[2] or now - seen[1] < self.debounce:
+                continue
+            if self.cache.is_warm(path, signature):
+                seen[2] = True
+                continue
+            try:
+                self._queue.put_nowait(path)
+            except queue.Full:
+                continue
+            seen[2] = True
+        for path in set(self._seen) - present:
+            del self._seen[path]
+            try:
+                self.cache.remove(path)
+            except KeyError:
+                pass
+        self._first_scan = False
+
+    def _work(self):
+        if sys.platform.startswith('linux'):
+            # Linux applies the nice value to the calling thread only (which
+            # still holds the GIL while it parses, see the class docstring)
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+            except OSError:
+                pass
+        while not self._stop_event.is_set():
+            try:
+                path = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            try:
+                self.cache.warm(path)
+            except Exception as e:
+                # Keep the worker alive; the path stays marked as queued in
+                # _scan, so it is only retried once its signature changes
+                print(f"prewarm: failed to process '{path}': "
+                      f"{type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
@@ -1,18 +1,51 @@
+import contextlib
+import os
+
 import networkx as nx
 
 
+@contextlib.contextmanager
+def edge_lines(edgelist):
+    """Open an edgelist given either as a filename or as an iterable of lines.
+
+    Lets the readers and detectors consume generators (e.g. merge_edgelists)
+    as well as files, without reading the whole edgelist into memory.
+    """
+    if isinstance(edgelist, (str, os.PathLike)):
+        with open(edgelist, 'r') as f:
+            yield f
+    else:
+        yield edgelist
+
+
+def _add_edge(G, edge):
+    parts = edge.split(' ')
+    from_ = parts[0]
+    to_ = parts[1]
+    key_ = parts[2]
+    if (from_, to_, key_) in G.edges:
+        G.edges[from_, to_, key_]["weight"] += 1
+    else:
+        G.add_edge(from_, to_, key_, weight=1)
+
+
 def read_edgelist(path):
     G = nx.MultiDiGraph()
-    with open(path, 'r') as f:
-        edges = f.readlines()
-    for edge in edges:
-        parts = edge.split(' ')
-        from_ = parts[0]
-        to_ = parts[1]
-        key_ = parts[2]
-        if (from_, to_, key_) in G.edges:
-            G.edges[from_, to_, key_]["weight"] += 1
-        else:
-            G.add_edge(from_, to_, key_, weight=1)
+    with edge_lines(path) as edges:
+        for edge in edges:
+            _add_edge(G, edge)
 
     return G
+
+
+def record_edgelist(edgelist, G):
+    """Yield the lines of an edgelist, adding each edge to G on the way.
+
+    G ends up as read_edgelist would build it, so a single pass over a
+    stream (e.g. merge_edgelists) can feed both the graph and a detector
+    such as request_bundle.
+    """
+    with edge_lines(edgelist) as edges:
+        for edge in edges:
+            _add_edge(G, edge)
+            yield edge
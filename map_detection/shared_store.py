@@ -0,0 +1,497 @@
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import networkx as nx
+import numpy as np
+
+from map_detection.read_edgelist import edge_lines
+from map_detection.degree_index import DegreeIndex
+from map_detection.detectors.bundle_runs import BundleRuns
+
+__all__ = ['SharedGraphStore', 'SharedGraph']
+
+# refcount, version, metadata offset, metadata size
+_HEADER = struct.Struct('<4q')
+_REFCOUNT = struct.Struct('<q')
+# Length of the manifest, _RETIRED once it was replaced or unlinked
+_LENGTH = struct.Struct('<q')
+_RETIRED = -1
+_DEGREE_ARRAYS = ('in_degree', 'out_degree', 'single_pred', 'pred_out_degree')
+
+
+_SHM_DIR = '/dev/shm'
+
+
+def _segment_path(name):
+    return os.path.join(_SHM_DIR, name)
+
+
+def _create_segment(name, size):
+    """Create the shared memory segment name and map it writable.
+
+    Segments are files in /dev/shm, whose lifetime the store manages itself
+    (unlike multiprocessing.shared_memory, whose resource tracker unlinks
+    segments when the process that opened them exits).
+    """
+    path = _segment_path(name)
+    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+    try:
+        os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    except BaseException:
+        os.unlink(path)
+        raise
+    finally:
+        os.close(fd)
+
+
+def _map_segment(name, writable=False):
+    """Map the existing shared memory segment name, read-only by default."""
+    fd = os.open(_segment_path(name), os.O_RDWR if writable else os.O_RDONLY)
+    try:
+        prot = mmap.PROT_READ | (mmap.PROT_WRITE if writable else 0)
+        return mmap.mmap(fd, os.fstat(fd).st_size, prot=prot)
+    finally:
+        os.close(fd)
+
+
+def _add_ref(name, delta):
+    """Add delta to the reference count of segment name.
+
+    The segment is unlinked when the count drops to zero. Must be called
+    with the store lock held.
+    """
+    path = _segment_path(name)
+    fd = os.open(path, os.O_RDWR)
+    try:
+        refcount = _REFCOUNT.unpack(os.pread(fd, _REFCOUNT.size, 0))[0]
+        os.pwrite(fd, _REFCOUNT.pack(refcount + delta), 0)
+    finally:
+        os.close(fd)
+    if refcount + delta == 0:
+        os.unlink(path)
+
+
+def _derived_arrays(services, endpoints, caller, callee, endpoint, time_):
+    """All arrays published for an edgelist, by name.
+
+    Besides the calls themselves: the distinct weighted edges of the graph
+    read_edgelist builds, the DegreeIndex arrays and the BundleRuns
+    run-length tables.
+    """
+    arrays = {'calls.caller': caller, 'calls.callee': callee,
+              'calls.endpoint': endpoint, 'calls.time': time_}
+
+    # Distinct edges with their weights, in the order networkx iterates the
+    # edges of read_edgelist's graph: by caller, then by first appearance
+    # of the callee for that caller, then of the endpoint for that pair
+    triples = np.stack([caller, callee, endpoint], axis=1).reshape(-1, 3)
+    rows, first, weight = np.unique(triples, axis=0, return_index=True,
+                                    return_counts=True)
+    _, pair = np.unique(rows[:, :2], axis=0, return_inverse=True)
+    pair = pair.reshape(-1)
+    pair_first = np.full(len(rows), len(caller), dtype=np.int64)
+    np.minimum.at(pair_first, pair, first)
+    order = np.lexsort((first, pair_first[pair], rows[:, 0]))
+    arrays['edges.caller'] = rows[order, 0]
+    arrays['edges.callee'] = rows[order, 1]
+    arrays['edges.endpoint'] = rows[order, 2]
+    arrays['edges.weight'] = weight[order].astype(np.int64)
+
+    index = DegreeIndex.from_edges(services, caller, callee)
+    for name in _DEGREE_ARRAYS:
+        arrays[f'degree.{name}'] = getattr(index, name)
+
+    runs = BundleRuns.from_calls(services, endpoints, caller, callee,
+                                 endpoint)
+    for level in 'service_runs', 'endpoint_runs':
+        for name, array in getattr(runs, level).columns().items():
+            arrays[f'{level}.{name}'] = array
+    return arrays
+
+
+class SharedGraph:
+    """Read-only, zero-copy view of an edgelist in a SharedGraphStore.
+
+    The segment is mapped read-only, so its arrays cannot be written to.
+    Besides the calls in file order (integer-coded, with string tables for
+    service and endpoint names), it holds the weighted edges, the
+    DegreeIndex arrays and the BundleRuns tables computed by the loader:
+    degree_index() and bundle_runs() wrap them without copying or
+    re-reading the calls.
+
+    Release the view with close() (or use it as a context manager) as soon
+    as the indexes or tables needed are built: the read-only mapping stays
+    valid as long as any of its arrays is referenced, even once the segment
+    is unlinked, so views do not need to hold a reference to it.
+    """
+
+    def __init__(self, store, key, name, mapping):
+        self.key = key
+        self._store = store
+        self._name = name
+        _, self.version, meta_offset, meta_nbytes = \
+            _HEADER.unpack_from(mapping)
+        meta = json.loads(mapping[meta_offset:meta_offset + meta_nbytes])
+        self.services = meta['services']
+        self.endpoints = meta['endpoints']
+        self.arrays = {array: np.frombuffer(mapping, dtype, n, offset)
+                       for array, (offset, dtype, n) in meta['arrays'].items()}
+        self.caller = self.arrays['calls.caller']
+        self.callee = self.arrays['calls.callee']
+        self.endpoint = self.arrays['calls.endpoint']
+        self.time = self.arrays['calls.time']
+
+    def __len__(self):
+        return len(self.caller)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def degree_index(self):
+        """Return a DegreeIndex over the shared degree arrays."""
+        return DegreeIndex.from_arrays(
+            self.services, *(self.arrays[f'degree.{name}']
+                             for name in _DEGREE_ARRAYS))
+
+    def bundle_runs(self):
+        """Return a BundleRuns over the shared run-length tables."""
+        columns = [{name.split('.', 1)[1]: array
+                    for name, array in self.arrays.items()
+                    if name.startswith(f'{level}.')}
+                   for level in ('service_runs', 'endpoint_runs')]
+        return BundleRuns.from_columns(self.services, self.endpoints,
+                                       *columns)
+
+    def weighted_edges(self):
+        """Return the (from, to, endpoint, weight) edges of read_edgelist.
+
+        Same as G.edges(keys=True, data='weight'), in the same order.
+        """
+        return [(self.services[f], self.services[t], self.endpoints[e], w)
+                for f, t, e, w in zip(self.arrays['edges.caller'].tolist(),
+                                      self.arrays['edges.callee'].tolist(),
+                                      self.arrays['edges.endpoint'].tolist(),
+                                      self.arrays['edges.weight'].tolist())]
+
+    def edges(self, chunk_size=65536):
+        """Yield the calls as edgelist lines, see read_edgelist."""
+        services = self.services
+        endpoints = self.endpoints
+        for start in range(0, len(self), chunk_size):
+            stop = start + chunk_size
+            times = np.datetime_as_string(self.time[start:stop], unit='us')
+            for f, t, e, time_ in zip(self.caller[start:stop].tolist(),
+                                      self.callee[start:stop].tolist(),
+                                      self.endpoint[start:stop].tolist(),
+                                      times):
+                yield f"{services[f]} {services[t]} {endpoints[e]} {time_}\n"
+
+    def graph(self):
+        """Build the weighted call graph, same as read_edgelist."""
+        G = nx.MultiDiGraph()
+        G.add_nodes_from(self.services)
+        for f, t, e, w in self.weighted_edges():
+            G.add_edge(f, t, e, weight=w)
+        return G
+
+    def close(self):
+        """Drop this view's reference to the segment."""
+        if self._name is None:
+            return
+        name, self._name = self._name, None
+        self._store._release(name)
+
+
+class SharedGraphStore:
+    """Store of parsed edgelists in shared memory, shared by many processes.
+
+    One loader process publishes edgelists (create=True), any number of
+    worker processes attach to them read-only without copying. Every
+    published edgelist lives in its own segment holding a reference count;
+    the store holds one reference to the current version of each key and
+    every attached SharedGraph holds one more. Publishing a key again swaps
+    the new version in atomically: readers attaching afterwards get the new
+    version, readers already attached keep the old one, which is unlinked
+    once the last of them is closed.
+
+    A manifest segment maps keys to their current segment, and updates to
+    it and to the reference counts are serialized by a file lock. The
+    manifest grows as needed: it is replaced by a larger one, and the old
+    one is marked as retired. Readers follow a retired manifest to the
+    current one, so workers keep working across a restart of the loader
+    (destroy(), then a new store with create=True). While no loader is
+    running they see no keys. Segments are files in /dev/shm, so the store
+    requires Linux.
+
+    Parameters
+    __________
+    prefix : str, optional (default 'map_detection')
+        Name prefix of the shared memory segments and of the lock file
+    create : bool, optional (default False)
+        Create the manifest (loader process) instead of attaching to it
+    manifest_size : int, optional (default 1 MiB)
+        Initial size in bytes of the manifest segment
+    """
+
+    def __init__(self, prefix='map_detection', create=False,
+                 manifest_size=1 << 20):
+        self.prefix = prefix
+        self._thread_lock = threading.Lock()
+        self._lock_file = open(os.path.join(tempfile.gettempdir(),
+                                            f"{prefix}.lock"), 'a')
+        self._manifest_name = f"{prefix}_manifest"
+        with self._locked():
+            if create:
+                try:
+                    self._manifest = _create_segment(self._manifest_name,
+                                                     manifest_size)
+                except FileExistsError:
+                    pass
+                else:
+                    # Segment names include the generation, so that they do
+                    # not clash with those of an earlier loader
+                    self._write_manifest({'generation': os.urandom(4).hex(),
+                                          'counter': 0, 'keys': dict()})
+                    return
+            self._manifest = _map_segment(self._manifest_name, writable=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        """Return the current manifest, must be called with the lock held."""
+        length, = _LENGTH.unpack_from(self._manifest)
+        if length == _RETIRED:
+            try:
+                manifest = _map_segment(self._manifest_name, writable=True)
+            except FileNotFoundError:
+                # The loader is gone, until a new one starts
+                return {'generation': None, 'counter': 0, 'keys': dict()}
+            self._manifest.close()
+            self._manifest = manifest
+            length, = _LENGTH.unpack_from(self._manifest)
+        start = _LENGTH.size
+        return json.loads(self._manifest[start:start + length])
+
+    def _write_manifest(self, manifest):
+        """Write the manifest read before under the same lock."""
+        if _LENGTH.unpack_from(self._manifest)[0] == _RETIRED:
+            raise FileNotFoundError(f"Store '{self.prefix}' was destroyed")
+        data = json.dumps(manifest).encode()
+        size = _LENGTH.size + len(data)
+        if size > len(self._manifest):
+            self._grow_manifest(max(2 * len(self._manifest), 2 * size))
+        self._manifest[_LENGTH.size:size] = data
+        _LENGTH.pack_into(self._manifest, 0, len(data))
+
+    def _grow_manifest(self, size):
+        name = f"{self._manifest_name}_{os.getpid()}"
+        manifest = _create_segment(name, size)
+        os.rename(_segment_path(name), _segment_path(self._manifest_name))
+        _LENGTH.pack_into(self._manifest, 0, _RETIRED)
+        self._manifest.close()
+        self._manifest = manifest
+
+    def _release(self, name):
+        with self._locked():
+            _add_ref(name, -1)
+
+    def keys(self):
+        with self._locked():
+            return list(self._read_manifest()['keys'])
+
+    def versions(self):
+        """Return the current version of every published key."""
+        with self._locked():
+            keys = self._read_manifest()['keys']
+        return {key: entry['version'] for key, entry in keys.items()}
+
+    def signature(self, key):
+        """Return the source signature recorded when key was published."""
+        with self._locked():
+            entry = self._read_manifest()['keys'].get(key)
+        return None if entry is None else tuple(entry['signature'])
+
+    def publish(self, key, edgelist, signature=None):
+        """Parse an edgelist into shared memory under key.
+
+        Parameters
+        __________
+        key : str,
+            Name the edgelist is published under, e.g. its path
+        edgelist : str or iterable[str],
+            Filename of the edgelist of the call graph, or its lines
+        signature : any JSON-serializable, optional (default None)
+            Identifies the source version, e.g. (mtime, size) of the file
+
+        Returns
+        _______
+        version : int,
+            Version of key now current in the store, versions increase
+            store-wide so they are never reused, even after remove(key)
+        """
+
+        service_ids = dict()
+        endpoint_ids = dict()
+        caller, callee, endpoint, times = [], [], [], []
+        with edge_lines(edgelist) as edges:
+            for edge in edges:
+                from_, to_, key_, time_ = edge.split(' ')
+                caller.append(service_ids.setdefault(from_, len(service_ids)))
+                callee.append(service_ids.setdefault(to_, len(service_ids)))
+                endpoint.append(endpoint_ids.setdefault(key_,
+                                                        len(endpoint_ids)))
+                times.append(time_.rstrip('\n'))
+        services = list(service_ids)
+        endpoints = list(endpoint_ids)
+        arrays = _derived_arrays(services, endpoints,
+                                 np.array(caller, dtype=np.int32),
+                                 np.array(callee, dtype=np.int32),
+                                 np.array(endpoint, dtype=np.int32),
+                                 np.array(times, dtype='datetime64[us]'))
+
+        toc = dict()
+        offset = _HEADER.size
+        for name, array in arrays.items():
+            offset += -offset % 8
+            toc[name] = offset, array.dtype.str, len(array)
+            offset += array.nbytes
+        meta = json.dumps({'services': services, 'endpoints': endpoints,
+                           'arrays': toc}).encode()
+
+        with self._locked():
+            manifest = self._read_manifest()
+            old = manifest['keys'].get(key)
+            manifest['counter'] += 1
+            version = manifest['counter']
+            name = f"{self.prefix}_{manifest['generation']}_{version}"
+            segment = _create_segment(name, offset + len(meta))
+            try:
+                _HEADER.pack_into(segment, 0, 1, version, offset, len(meta))
+                for array_name, array in arrays.items():
+                    start = toc[array_name][0]
+                    segment[start:start + array.nbytes] = array.tobytes()
+                segment[offset:offset + len(meta)] = meta
+                manifest['keys'][key] = {'version': version, 'segment': name,
+                                         'signature': signature}
+                self._write_manifest(manifest)
+            except BaseException:
+                # Nothing refers to the segment yet
+                os.unlink(_segment_path(name))
+                raise
+            finally:
+                segment.close()
+            if old is not None:
+                _add_ref(old['segment'], -1)
+        return version
+
+    def remove(self, key):
+        """Unpublish key, it is unlinked once all readers are closed."""
+        with self._locked():
+            manifest = self._read_manifest()
+            entry = manifest['keys'].pop(key)
+            self._write_manifest(manifest)
+            _add_ref(entry['segment'], -1)
+
+    def attach(self, key):
+        """Attach read-only to the current version of key.
+
+        Raises
+        ______
+        KeyError
+            If key is not published
+        """
+
+        with self._locked():
+            entry = self._read_manifest()['keys'][key]
+            _add_ref(entry['segment'], 1)
+            mapping = _map_segment(entry['segment'])
+        return SharedGraph(self, key, entry['segment'], mapping)
+
+    def is_warm(self, path, signature=None):
+        """Whether the published version of path is up to date."""
+        if signature is None:
+            stat = os.stat(path)
+            signature = stat.st_mtime_ns, stat.st_size
+        return self.signature(path) == tuple(signature)
+
+    def warm(self, path):
+        """Publish path unless the published version is up to date.
+
+        Together with is_warm, lets an EdgelistWatcher keep the store in
+        sync with an edgelist directory.
+        """
+        stat = os.stat(path)
+        signature = stat.st_mtime_ns, stat.st_size
+        if not self.is_warm(path, signature):
+            self.publish(path, path, signature)
+
+    def close(self):
+        """Detach from the manifest, published edgelists stay available."""
+        self._manifest.close()
+        self._lock_file.close()
+
+    def destroy(self):
+        """Unpublish all keys and unlink the manifest (loader process)."""
+        with self._locked():
+            manifest = self._read_manifest()
+            for entry in manifest['keys'].values():
+                _add_ref(entry['segment'], -1)
+            _LENGTH.pack_into(self._manifest, 0, _RETIRED)
+            os.unlink(_segment_path(self._manifest_name))
+        self.close()
+
+if __name__ == '__main__':
+    from map_detection.prewarm import EdgelistWatcher
+
+    parser = argparse.ArgumentParser(description="Publish the edgelists of a "
+                                                 "directory to shared memory "
+                                                 "and keep them up to date")
+    parser.add_argument('--directory', '-d', required=False,
+                        default='edgelists', help="Directory of edgelists")
+    parser.add_argument('--prefix', '-p', required=False,
+                        default='map_detection', help="Name prefix of the "
+                                                      "shared memory store")
+    args = parser.parse_args()
+
+    # Unlink the segments on termination as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    store = SharedGraphStore(args.prefix, create=True)
+    watcher = EdgelistWatcher(args.directory, store, debounce=0.0,
+                              warm_existing=True)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        watcher.join()
+        store.destroy()
@@ -0,0 +1,212 @@
+import hashlib
+import heapq
+import itertools
+import math
+
+import networkx as nx
+
+from map_detection.read_edgelist import edge_lines
+
+__all__ = ['CountMinSketch', 'HyperLogLog', 'SpaceSaving',
+           'read_edgelist_sketch']
+
+
+def _hashes(item, count, salt=b''):
+    """Return `count` 64-bit hashes of `item` (str or tuple).
+
+    Derived from two base hashes as h1 + i * h2 (Kirsch-Mitzenmacher), so
+    any number of hashes costs a single digest.
+    """
+    if isinstance(item, tuple):
+        item = '\x00'.join(item)
+    digest = hashlib.blake2b(item.encode(), digest_size=16, salt=salt).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) & 0xFFFFFFFFFFFFFFFF for i in range(count)]
+
+
+class CountMinSketch:
+    """Count-Min sketch of item frequencies in fixed memory.
+
+    With width w = ceil(e / epsilon) and depth d = ceil(ln(1 / delta)), an
+    estimate never undercounts and overcounts by more than epsilon * N (N
+    being the total count added) with probability at least 1 - delta.
+
+    Parameters
+    __________
+    epsilon : float, optional (default 0.001)
+        Additive error bound relative to the total count
+    delta : float, optional (default 0.01)
+        Probability of exceeding the error bound
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = [[0] * self.width for _ in range(self.depth)]
+        self.total = 0
+
+    def add(self, item, count=1):
+        for row, h in zip(self.table, _hashes(item, self.depth)):
+            row[h % self.width] += count
+        self.total += count
+
+    def query(self, item):
+        return min(row[h % self.width]
+                   for row, h in zip(self.table, _hashes(item, self.depth)))
+
+    def error_bound(self):
+        """Maximum overcount that holds with probability 1 - delta."""
+        return self.epsilon * self.total
+
+
+class HyperLogLog:
+    """HyperLogLog estimate of the number of distinct items in fixed memory.
+
+    Uses m = 2 ** precision one-byte registers, the relative standard error
+    of the estimate is about 1.04 / sqrt(m) (3.25% for the default
+    precision 10).
+
+    Parameters
+    __________
+    precision : int, optional (default 10)
+        Number of hash bits used to select a register, between 4 and 16
+    """
+
+    def __init__(self, precision=10):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision must be between 4 and 16, "
+                             f"got {precision}")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, item):
+        h = _hashes(item, 1, salt=b'hll')[0]
+        index = h & (self.m - 1)
+        rest = h >> self.precision
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m,
+                                                      0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def error_bound(self):
+        """Relative standard error of count()."""
+        return 1.04 / math.sqrt(self.m)
+
+
+class SpaceSaving:
+    """Space-Saving top-k heavy hitters in fixed memory.
+
+    Keeps at most k counters. Every item with true frequency above N / k is
+    guaranteed to be tracked, and each tracked count overestimates the true
+    frequency by at most N / k (N being the total count added). The counter
+    to evict is found with a min-heap of counts in O(log k); outdated heap
+    entries are skipped when popped and dropped when the heap is rebuilt.
+
+    Parameters
+    __________
+    k : int, optional (default 64)
+        Number of counters kept
+    """
+
+    def __init__(self, k=64):
+        self.k = k
+        self.counts = dict()
+        self.total = 0
+        # (count, sequence, item), an entry is current if count matches
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def add(self, item, count=1):
+        self.total += count
+        if item in self.counts or len(self.counts) < self.k:
+            self.counts[item] = self.counts.get(item, 0) + count
+        else:
+            self.counts[item] = self.counts.pop(self._pop_min()) + count
+        if len(self._heap) >= 2 * self.k:
+            self._heap = [(c, next(self._sequence), i)
+                          for i, c in self.counts.items()]
+            heapq.heapify(self._heap)
+        else:
+            heapq.heappush(self._heap, (self.counts[item],
+                                        next(self._sequence), item))
+
+    def _pop_min(self):
+        """Pop the heap down to the item with the smallest count."""
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item
+
+    def top(self, n=None):
+        """Return up to n (item, count) pairs sorted by descending count."""
+        ranked = sorted(self.counts.items(), key=lambda t: t[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def error_bound(self):
+        """Maximum overcount of any tracked item."""
+        return self.total / self.k
+
+
+def read_edgelist_sketch(path, epsilon=0.001, delta=0.01, k=64,
+                         precision=10):
+    """Read an edgelist into fixed-size sketches instead of exact counters.
+
+    Memory does not grow with the length of the edgelist (apart from one
+    HyperLogLog per service). Error bounds are those of CountMinSketch,
+    SpaceSaving and HyperLogLog.
+
+    Parameters
+    __________
+    path : str or iterable[str],
+        Filename of the edgelist of the call graph, or its lines
+    epsilon : float, optional (default 0.001)
+        Count-Min error bound relative to the number of calls
+    delta : float, optional (default 0.01)
+        Count-Min probability of exceeding the error bound
+    k : int, optional (default 64)
+        Number of heaviest (caller, callee, endpoint) edges kept in the graph
+    precision : int, optional (default 10)
+        HyperLogLog precision for the distinct caller counts
+
+    Returns
+    _______
+    G : networkx.MultiDiGraph,
+        Graph of the k heaviest edges, weights are estimates
+    edge_weights : CountMinSketch,
+        Weight estimate of any (caller, callee, endpoint) edge
+    distinct_callers : dict[str, HyperLogLog],
+        Distinct caller estimate for every called service
+    """
+
+    edge_weights = CountMinSketch(epsilon, delta)
+    heavy_edges = SpaceSaving(k)
+    distinct_callers = dict()
+    with edge_lines(path) as edges:
+        for edge in edges:
+            from_, to_, key_ = edge.split(' ')[:3]
+            edge_weights.add((from_, to_, key_))
+            heavy_edges.add((from_, to_, key_))
+            if to_ not in distinct_callers:
+                distinct_callers[to_] = HyperLogLog(precision)
+            distinct_callers[to_].add(from_)
+
+    G = nx.MultiDiGraph()
+    for (from_, to_, key_), count in heavy_edges.top():
+        G.add_edge(from_, to_, key_,
+                   weight=min(count, edge_weights.query((from_, to_, key_))))
+
+    return G, edge_weights, distinct_callers
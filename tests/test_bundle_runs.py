@@ -0,0 +1,71 @@
+import os
+from collections import Counter
+from itertools import groupby
+
+import pytest
+
+from map_detection.detectors import BundleRuns, request_bundle
+
+EDGELISTS = os.path.join(os.path.dirname(__file__), os.pardir, 'edgelists')
+PATHS = sorted(os.path.join(EDGELISTS, name)
+               for name in os.listdir(EDGELISTS)) \
+    if os.path.isdir(EDGELISTS) else []
+
+EDGES = ["a b /x 2022-06-13T05:15:16.587000\n",
+         "a b /x 2022-06-13T05:15:16.588000\n",
+         "a b /y 2022-06-13T05:15:16.589000\n",
+         "c d /z 2022-06-13T05:15:16.590000\n",
+         "a b /x 2022-06-13T05:15:16.591000\n",
+         "a b /x 2022-06-13T05:15:16.592000\n",
+         "a b /x 2022-06-13T05:15:16.593000\n"]
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return [(path, BundleRuns(path)) for path in PATHS]
+
+
+@pytest.mark.skipif(not PATHS, reason="no edgelists corpus")
+@pytest.mark.parametrize('threshold_service, threshold_endpoint',
+                         [(2, 2), (2, 3), (3, 2), (5, 5), (10, 4)])
+def test_same_results_as_request_bundle(corpus, threshold_service,
+                                        threshold_endpoint):
+    for path, runs in corpus:
+        assert runs.bundles(threshold_service, threshold_endpoint) == \
+            request_bundle(path, threshold_service, threshold_endpoint)
+
+
+def test_final_run_is_not_reported():
+    runs = BundleRuns(EDGES)
+    assert runs.bundles() == request_bundle(EDGES)
+    assert runs.bundles() == ([('a', 'b', 3)], [('a', 'b', '/x', 2)])
+    # Unlike bundles(), histograms() count the final run
+    assert runs.histograms()[('a', 'b')] == Counter({3: 2})
+    assert runs.histograms(endpoint_level=True)[('a', 'b', '/x')] == \
+        Counter({2: 1, 3: 1})
+
+
+def test_empty_edgelist(tmp_path):
+    path = tmp_path / 'empty.edgelist'
+    path.write_text('')
+    runs = BundleRuns(str(path))
+    assert runs.bundles() == request_bundle(str(path)) == ([], [])
+    assert runs.histograms() == runs.histograms(endpoint_level=True) == {}
+
+
+def _histograms(edges, endpoint_level):
+    keys = [tuple(edge.split(' ')[:3 if endpoint_level else 2])
+            for edge in edges]
+    histograms = dict()
+    for key, run in groupby(keys):
+        histograms.setdefault(key, Counter())[len(list(run))] += 1
+    return histograms
+
+
+@pytest.mark.skipif(not PATHS, reason="no edgelists corpus")
+@pytest.mark.parametrize('endpoint_level', [False, True])
+def test_histograms(corpus, endpoint_level):
+    for path, runs in corpus[::10]:
+        with open(path, 'r') as f:
+            expected = _histograms(f, endpoint_level)
+        assert runs.histograms(endpoint_level) == expected
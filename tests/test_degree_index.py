@@ -0,0 +1,63 @@
+import os
+import random
+
+import pytest
+
+from map_detection import DegreeIndex, evaluate_designations, read_edgelist
+from map_detection.detectors import frontend_integration, \
+    information_holder_resource
+
+EDGELISTS = os.path.join(os.path.dirname(__file__), os.pardir, 'edgelists')
+PATHS = sorted(os.path.join(EDGELISTS, name)
+               for name in os.listdir(EDGELISTS)) \
+    if os.path.isdir(EDGELISTS) else []
+
+pytestmark = pytest.mark.skipif(not PATHS, reason="no edgelists corpus")
+
+
+def _designations(G, rng):
+    """Random frontend/database designations, with an unknown service."""
+    nodes = sorted(G.nodes)
+    for size in 0, 1, 3, len(nodes):
+        frontends = set(rng.sample(nodes, min(size, len(nodes))))
+        databases = set(rng.sample(nodes, min(size, len(nodes))))
+        yield frontends | {'no-such-service'}, databases | {'no-such-service'}
+    yield None, None
+
+
+@pytest.fixture(scope='module')
+def graphs():
+    return [read_edgelist(path) for path in PATHS]
+
+
+def test_same_results_as_detectors(graphs):
+    rng = random.Random(0)
+    for G in graphs:
+        index = DegreeIndex(G)
+        for frontends, databases in _designations(G, rng):
+            assert index.frontend_integration(frontends) == \
+                frontend_integration(G, frontends)
+            assert index.information_holder_resource(databases) == \
+                information_holder_resource(G, databases)
+
+
+def test_evaluate_designations(graphs):
+    rng = random.Random(1)
+    for G in graphs[::10]:
+        hypotheses = list(_designations(G, rng))
+        expected = [(frontend_integration(G, frontends),
+                     information_holder_resource(G, databases))
+                    for frontends, databases in hypotheses]
+        assert evaluate_designations(G, hypotheses) == expected
+
+
+def test_checks_do_not_share_results(graphs):
+    G = max(graphs, key=len)
+    index = DegreeIndex(G)
+    databases = {node for node in G.nodes if G.out_degree(node) > 0}
+    before = index.information_holder_resource()
+    index.information_holder_resource(databases)
+    assert index.information_holder_resource() == before
+    candidates, _ = index.frontend_integration(set(G.nodes))
+    assert candidates - set(G.nodes) == set()
+    assert index.frontend_integration()[0] == candidates
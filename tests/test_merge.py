@@ -0,0 +1,105 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from map_detection.merge import merge_edgelists
+
+START = datetime(2022, 6, 13, 5, 15, 16)
+
+
+def _edges(n, seed):
+    """n time-sorted edgelist lines, times differ between seeds below 10."""
+    rng = random.Random(seed)
+    return [f"svc-{rng.randrange(5)} svc-{rng.randrange(5)} /api/{seed} "
+            f"{(START + timedelta(milliseconds=10 * i + seed)).isoformat()}"
+            f"\n" for i in range(n)]
+
+
+def _write(tmp_path, name, edges):
+    path = tmp_path / name
+    path.write_text(''.join(edges))
+    return str(path)
+
+
+@pytest.fixture
+def spill_dir(tmp_path):
+    path = tmp_path / 'spill'
+    path.mkdir()
+    return path
+
+
+def test_interleaves_sorted_edgelists(tmp_path, spill_dir):
+    inputs = [_edges(40, seed) for seed in range(4)]
+    paths = [_write(tmp_path, f"{i}.edgelist", edges)
+             for i, edges in enumerate(inputs)]
+    merged = list(merge_edgelists(paths, tmp_dir=spill_dir))
+    assert merged == sorted((e for edges in inputs for e in edges),
+                            key=lambda e: e.rsplit(' ', 1)[1])
+    assert not any(spill_dir.iterdir())
+
+
+def test_external_sort_of_unsorted_edgelists(tmp_path, spill_dir):
+    inputs = [_edges(50, seed) for seed in range(3)]
+    expected = sorted((e for edges in inputs for e in edges),
+                      key=lambda e: e.rsplit(' ', 1)[1])
+    paths = []
+    for i, edges in enumerate(inputs):
+        edges = edges[:]
+        random.Random(i).shuffle(edges)
+        paths.append(_write(tmp_path, f"{i}.edgelist", edges))
+    merged = list(merge_edgelists(paths, chunk_size=7, tmp_dir=spill_dir))
+    assert merged == expected
+    assert not any(spill_dir.iterdir())
+
+
+@pytest.mark.parametrize('fan_in', [2, 3, 64])
+def test_multi_pass_merge(tmp_path, spill_dir, fan_in):
+    inputs = [_edges(30, seed) for seed in range(5)]
+    expected = sorted((e for edges in inputs for e in edges),
+                      key=lambda e: e.rsplit(' ', 1)[1])
+    paths = [_write(tmp_path, 'sorted.edgelist', inputs[0])]
+    for i, edges in enumerate(inputs[1:]):
+        edges = edges[:]
+        random.Random(i).shuffle(edges)
+        paths.append(_write(tmp_path, f"{i}.edgelist", edges))
+    merged = list(merge_edgelists(paths, chunk_size=7, fan_in=fan_in,
+                                  tmp_dir=spill_dir))
+    assert merged == expected
+    assert not any(spill_dir.iterdir())
+    # Inputs take part in the merge passes but are never removed
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_equal_times_keep_input_order(tmp_path):
+    time = START.isoformat()
+    paths = [_write(tmp_path, f"{i}.edgelist", [f"a b /{i} {time}\n"])
+             for i in range(3)]
+    assert list(merge_edgelists(paths)) == \
+        [f"a b /{i} {time}\n" for i in range(3)]
+
+
+def test_missing_final_newline_and_blank_lines(tmp_path):
+    edges = _edges(3, 0)
+    path = _write(tmp_path, 'a.edgelist',
+                  [edges[0], '\n', edges[1], edges[2].rstrip('\n')])
+    assert list(merge_edgelists([path])) == edges
+
+
+def test_spills_removed_when_closed_early(tmp_path, spill_dir):
+    edges = _edges(50, 0)
+    random.Random(0).shuffle(edges)
+    paths = [_write(tmp_path, f"{i}.edgelist", edges) for i in range(3)]
+    merged = merge_edgelists(paths, chunk_size=7, fan_in=2,
+                             tmp_dir=spill_dir)
+    next(merged)
+    assert any(spill_dir.iterdir())
+    merged.close()
+    assert not any(spill_dir.iterdir())
+
+
+def test_fan_in_at_least_two(tmp_path):
+    with pytest.raises(ValueError):
+        next(merge_edgelists([_write(tmp_path, 'a.edgelist', _edges(1, 0))],
+                             fan_in=1))
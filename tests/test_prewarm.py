@@ -0,0 +1,141 @@
+import os
+import queue
+import time
+
+import pytest
+
+from map_detection import EdgelistWatcher, ResultCache, read_edgelist
+from map_detection.detectors import request_bundle
+from map_detection.prewarm import compute_results
+
+EDGES = ["a b /x 2022-06-13T05:15:16.587000\n",
+         "a b /x 2022-06-13T05:15:16.588000\n",
+         "a c /y 2022-06-13T05:15:16.589000\n",
+         "c d /z 2022-06-13T05:15:16.590000\n",
+         "c d /z 2022-06-13T05:15:16.591000\n"]
+
+
+def _write(directory, name, edges=EDGES):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.writelines(edges)
+    return path
+
+
+def _watcher(directory, cache=None, **kwargs):
+    return EdgelistWatcher(str(directory), cache or ResultCache(), **kwargs)
+
+
+def _queued(watcher):
+    paths = []
+    while True:
+        try:
+            paths.append(watcher._queue.get_nowait())
+        except queue.Empty:
+            return paths
+
+
+def test_compute_results_matches_detectors(tmp_path):
+    path = _write(tmp_path, 'a.edgelist')
+    edges, index, bundle_runs = compute_results(path)
+    G = read_edgelist(path)
+    assert edges == list(G.edges(keys=True, data='weight'))
+    assert index.services == list(G.nodes)
+    assert bundle_runs.bundles() == request_bundle(path)
+
+
+def test_existing_files_are_skipped(tmp_path):
+    _write(tmp_path, 'a.edgelist')
+    watcher = _watcher(tmp_path, debounce=0.0)
+    watcher._scan()
+    watcher._scan()
+    assert _queued(watcher) == []
+
+
+def test_warm_existing(tmp_path):
+    path = _write(tmp_path, 'a.edgelist')
+    watcher = _watcher(tmp_path, debounce=0.0, warm_existing=True)
+    watcher._scan()
+    watcher._scan()
+    assert _queued(watcher) == [path]
+
+
+def test_debounce(tmp_path):
+    watcher = _watcher(tmp_path, debounce=3600.0)
+    watcher._scan()
+    _write(tmp_path, 'a.edgelist')
+    _write(tmp_path, 'ignored.txt')
+    watcher._scan()
+    watcher._scan()
+    assert _queued(watcher) == []
+
+    watcher.debounce = 0.0
+    watcher._scan()
+    assert _queued(watcher) == [os.path.join(tmp_path, 'a.edgelist')]
+    # Queued once per signature
+    watcher._scan()
+    assert _queued(watcher) == []
+
+
+def test_changed_file_is_queued_again(tmp_path):
+    watcher = _watcher(tmp_path, debounce=0.0)
+    watcher._scan()
+    path = _write(tmp_path, 'a.edgelist')
+    watcher._scan()
+    watcher._scan()
+    assert _queued(watcher) == [path]
+    _write(tmp_path, 'a.edgelist', EDGES[:2])
+    watcher._scan()
+    watcher._scan()
+    assert _queued(watcher) == [path]
+
+
+def test_full_queue_is_retried(tmp_path):
+    watcher = _watcher(tmp_path, debounce=0.0, queue_size=1)
+    watcher._scan()
+    paths = {_write(tmp_path, 'a.edgelist'), _write(tmp_path, 'b.edgelist')}
+    watcher._scan()
+    watcher._scan()
+    first = _queued(watcher)
+    assert len(first) == 1
+    watcher._scan()
+    second = _queued(watcher)
+    assert set(first + second) == paths
+
+
+def test_deleted_file_is_removed_from_cache(tmp_path):
+    cache = ResultCache()
+    watcher = _watcher(tmp_path, cache, debounce=0.0)
+    watcher._scan()
+    path = _write(tmp_path, 'a.edgelist')
+    watcher._scan()
+    cache.warm(path)
+    assert cache.is_warm(path)
+    os.remove(path)
+    watcher._scan()
+    with pytest.raises(KeyError):
+        cache.remove(path)
+    # Deleting a file that was never cached is fine as well
+    _write(tmp_path, 'b.edgelist')
+    watcher._scan()
+    os.remove(os.path.join(tmp_path, 'b.edgelist'))
+    watcher._scan()
+
+
+def test_worker_survives_malformed_edgelist(tmp_path):
+    cache = ResultCache()
+    watcher = _watcher(tmp_path, cache, interval=0.05, debounce=0.0)
+    watcher.start()
+    try:
+        # Let the first scan pass, so that the files below are new
+        time.sleep(0.2)
+        bad = _write(tmp_path, 'bad.edgelist', ["not an edge\n"])
+        good = _write(tmp_path, 'good.edgelist')
+        deadline = time.monotonic() + 10
+        while not cache.is_warm(good) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert cache.is_warm(good)
+        assert not cache.is_warm(bad)
+    finally:
+        watcher.stop()
+        watcher.join()
@@ -0,0 +1,230 @@
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import numpy as np
+import pytest
+
+from map_detection import DegreeIndex, SharedGraphStore, read_edgelist
+from map_detection.detectors import request_bundle
+
+EDGELISTS = os.path.join(os.path.dirname(__file__), os.pardir, 'edgelists')
+PATHS = sorted(os.path.join(EDGELISTS, name)
+               for name in os.listdir(EDGELISTS)) \
+    if os.path.isdir(EDGELISTS) else []
+
+EDGES = ["a b /x 2022-06-13T05:15:16.587000\n",
+         "a b /x 2022-06-13T05:15:16.588000\n",
+         "b c /y 2022-06-13T05:15:16.589000\n",
+         "a c /z 2022-06-13T05:15:16.590000\n"]
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/dev/shm'),
+                                reason="needs /dev/shm")
+
+
+@pytest.fixture
+def prefix():
+    prefix = f"test_{uuid.uuid4().hex[:12]}"
+    yield prefix
+    lock = os.path.join(tempfile.gettempdir(), f"{prefix}.lock")
+    if os.path.exists(lock):
+        os.remove(lock)
+
+
+@pytest.fixture
+def store(prefix):
+    store = SharedGraphStore(prefix, create=True)
+    yield store
+    if os.path.exists(f"/dev/shm/{prefix}_manifest"):
+        store.destroy()
+
+
+def _segments(prefix):
+    return sorted(name for name in os.listdir('/dev/shm')
+                  if name.startswith(f"{prefix}_") and
+                  not name.endswith('_manifest'))
+
+
+@pytest.mark.skipif(not PATHS, reason="no edgelists corpus")
+def test_round_trip(store):
+    for path in PATHS[::20]:
+        store.publish(path, path)
+        G = read_edgelist(path)
+        with store.attach(path) as shared:
+            assert shared.weighted_edges() == \
+                list(G.edges(keys=True, data='weight'))
+            graph = shared.graph()
+            assert list(graph.nodes) == list(G.nodes)
+            assert list(graph.edges(keys=True, data='weight')) == \
+                list(G.edges(keys=True, data='weight'))
+
+            index, expected = shared.degree_index(), DegreeIndex(G)
+            assert index.services == expected.services
+            for name in ('in_degree', 'out_degree', 'single_pred',
+                         'pred_out_degree'):
+                assert np.array_equal(getattr(index, name),
+                                      getattr(expected, name))
+            assert index.frontend_candidates == expected.frontend_candidates
+            assert index.ihr_candidates == expected.ihr_candidates
+            assert index.ihr_violators == expected.ihr_violators
+
+            assert shared.bundle_runs().bundles(2, 3) == \
+                request_bundle(path, 2, 3)
+
+
+def test_edges_round_trip(store):
+    store.publish('key', EDGES)
+    with store.attach('key') as shared:
+        assert len(shared) == len(EDGES)
+        assert list(shared.edges(chunk_size=3)) == EDGES
+
+
+def test_empty_edgelist(store):
+    store.publish('key', [])
+    with store.attach('key') as shared:
+        assert shared.weighted_edges() == []
+        assert shared.bundle_runs().bundles() == ([], [])
+        assert shared.degree_index().frontend_candidates == frozenset()
+
+
+def test_views_are_read_only(store):
+    store.publish('key', EDGES)
+    with store.attach('key') as shared:
+        for array in shared.arrays.values():
+            assert not array.flags.writeable
+        with pytest.raises(ValueError):
+            shared.caller[0] = 1
+        index = shared.degree_index()
+        with pytest.raises(ValueError):
+            index.in_degree[0] = 1
+
+
+def test_views_outlive_close(store, prefix):
+    store.publish('key', EDGES)
+    shared = store.attach('key')
+    index = shared.degree_index()
+    bundle_runs = shared.bundle_runs()
+    shared.close()
+    shared.close()
+    store.remove('key')
+    assert _segments(prefix) == []
+    assert index.frontend_integration({'b'}) == (frozenset({'a'}), {'b'})
+    assert bundle_runs.bundles() == request_bundle(EDGES)
+
+
+def test_republish_unlinks_old_version(store, prefix):
+    first = store.publish('key', EDGES)
+    shared = store.attach('key')
+    second = store.publish('key', EDGES[:2])
+    assert second > first
+    assert store.versions() == {'key': second}
+    # The attached reader keeps the old version alive
+    assert len(_segments(prefix)) == 2
+    assert len(shared) == len(EDGES)
+    with store.attach('key') as current:
+        assert current.version == second
+        assert len(current) == 2
+    shared.close()
+    assert len(_segments(prefix)) == 1
+
+
+def test_remove(store, prefix):
+    first = store.publish('key', EDGES, signature=[1, 2])
+    assert store.signature('key') == (1, 2)
+    store.remove('key')
+    assert store.keys() == []
+    assert store.signature('key') is None
+    assert _segments(prefix) == []
+    with pytest.raises(KeyError):
+        store.attach('key')
+    with pytest.raises(KeyError):
+        store.remove('key')
+    # Versions are not reused after a removal
+    assert store.publish('key', EDGES) > first
+
+
+def test_failed_publish_leaves_no_segment(store, prefix, monkeypatch):
+    store.publish('key', EDGES)
+
+    def fail(manifest):
+        raise OSError("no space left")
+
+    monkeypatch.setattr(store, '_write_manifest', fail)
+    with pytest.raises(OSError):
+        store.publish('other', EDGES)
+    assert len(_segments(prefix)) == 1
+    monkeypatch.undo()
+    assert store.keys() == ['key']
+
+
+def test_manifest_grows(prefix):
+    loader = SharedGraphStore(prefix, create=True, manifest_size=64)
+    worker = SharedGraphStore(prefix)
+    try:
+        for i in range(100):
+            loader.publish(f"key{i}", EDGES)
+        assert sorted(worker.keys()) == sorted(f"key{i}" for i in range(100))
+        with worker.attach('key42') as shared:
+            assert len(shared) == len(EDGES)
+    finally:
+        worker.close()
+        loader.destroy()
+    assert _segments(prefix) == []
+
+
+def test_worker_follows_loader_restart(prefix):
+    loader = SharedGraphStore(prefix, create=True)
+    worker = SharedGraphStore(prefix)
+    try:
+        loader.publish('old', EDGES)
+        assert worker.keys() == ['old']
+        loader.destroy()
+        assert worker.keys() == []
+        with pytest.raises(KeyError):
+            worker.attach('old')
+
+        loader = SharedGraphStore(prefix, create=True)
+        loader.publish('new', EDGES)
+        assert worker.keys() == ['new']
+        with worker.attach('new') as shared:
+            assert len(shared) == len(EDGES)
+    finally:
+        worker.close()
+        loader.destroy()
+    assert _segments(prefix) == []
+
+
+def test_warm(store, tmp_path):
+    path = tmp_path / 'a.edgelist'
+    path.write_text(''.join(EDGES))
+    path = str(path)
+    assert not store.is_warm(path)
+    store.warm(path)
+    assert store.is_warm(path)
+    version = store.versions()[path]
+    store.warm(path)
+    assert store.versions()[path] == version
+    with open(path, 'a') as f:
+        f.write(EDGES[0])
+    assert not store.is_warm(path)
+    store.warm(path)
+    assert store.versions()[path] > version
+
+
+def test_attach_from_another_process(store, prefix):
+    store.publish('key', EDGES)
+    code = (f"from map_detection import SharedGraphStore\n"
+            f"store = SharedGraphStore({prefix!r})\n"
+            f"with store.attach('key') as shared:\n"
+            f"    print(shared.weighted_edges())\n"
+            f"store.close()\n")
+    root = os.path.join(os.path.dirname(__file__), os.pardir)
+    result = subprocess.run([sys.executable, '-c', code], cwd=root,
+                            capture_output=True, text=True, check=True)
+    with store.attach('key') as shared:
+        assert result.stdout.strip() == str(shared.weighted_edges())
+    # The other process released its reference
+    store.remove('key')
+    assert _segments(prefix) == []
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from map_detection import read_edgelist, read_edgelist_sketch
+from map_detection.detectors import request_bundle, request_bundle_sketch
+from map_detection.sketch import HyperLogLog
+
+EDGELISTS = os.path.join(os.path.dirname(__file__), os.pardir, 'edgelists')
+PATHS = sorted(os.path.join(EDGELISTS, name)
+               for name in os.listdir(EDGELISTS)) \
+    if os.path.isdir(EDGELISTS) else []
+
+EPSILON = 0.01
+DELTA = 0.01
+K = 8
+PRECISION = 10
+
+pytestmark = pytest.mark.skipif(not PATHS, reason="no edgelists corpus")
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    results = []
+    for path in PATHS:
+        G = read_edgelist(path)
+        exact = {(f, t, e): w for f, t, e, w in G.edges(keys=True,
+                                                        data='weight')}
+        sketch = read_edgelist_sketch(path, epsilon=EPSILON, delta=DELTA,
+                                      k=K, precision=PRECISION)
+        results.append((path, G, exact, sketch))
+    return results
+
+
+def test_corpus_exercises_eviction(corpus):
+    assert any(len(exact) > K for _, _, exact, _ in corpus)
+
+
+def test_count_min_within_bound(corpus):
+    checked = violations = 0
+    for _, _, exact, (_, weights, _) in corpus:
+        bound = weights.error_bound()
+        assert weights.total == sum(exact.values())
+        for edge, w in exact.items():
+            estimate = weights.query(edge)
+            assert estimate >= w
+            checked += 1
+            violations += estimate - w > bound
+    assert violations <= DELTA * checked
+
+
+def test_space_saving_recall_and_overcount(corpus):
+    for _, _, exact, (G_s, weights, _) in corpus:
+        n = weights.total
+        kept = {(f, t, e): w for f, t, e, w in G_s.edges(keys=True,
+                                                         data='weight')}
+        assert len(kept) <= K
+        for edge, w in exact.items():
+            if w > n / K:
+                assert edge in kept
+        for edge, w in kept.items():
+            assert exact[edge] <= w <= exact[edge] + n / K
+
+
+def test_hyperloglog_distinct_callers(corpus):
+    bound = 3 * 1.04 / (1 << PRECISION) ** 0.5
+    for _, G, _, (_, _, callers) in corpus:
+        for node, hll in callers.items():
+            true = len(G.pred[node])
+            assert abs(hll.count() - true) <= bound * true
+
+
+def test_hyperloglog_large_cardinality():
+    hll = HyperLogLog(PRECISION)
+    distinct = set()
+    for path in PATHS[:100]:
+        with open(path, 'r') as f:
+            for edge in f:
+                hll.add(edge)
+                distinct.add(edge)
+    error = abs(hll.count() - len(distinct)) / len(distinct)
+    assert error <= 3 * hll.error_bound()
+
+
+@pytest.mark.parametrize('k', [1, 3])
+def test_bundle_sketch_keeps_largest_bundles(corpus, k):
+    for path, _, _, _ in corpus:
+        exact = request_bundle(path)
+        sketch = request_bundle_sketch(path, k=k)
+        for exact_bundles, sketch_bundles in zip(exact, sketch):
+            assert len(sketch_bundles) == min(k, len(exact_bundles))
+            assert [b[-1] for b in sketch_bundles] == \
+                sorted((b[-1] for b in exact_bundles), reverse=True)[:k]
+            for bundle in sketch_bundles:
+                assert bundle in exact_bundles